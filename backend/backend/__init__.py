@@ -0,0 +1,8 @@
+# Celery es opcional: si está instalado, la app se carga con Django para que
+# `shared_task` use su configuración (broker de settings) en web y worker.
+try:
+    from .celery import app as celery_app
+except ImportError:  # pragma: no cover - depende del entorno
+    celery_app = None
+
+__all__ = ("celery_app",)
@@ -0,0 +1,14 @@
+# backend/celery.py
+from __future__ import annotations
+
+import os
+
+from celery import Celery
+
+# Worker: `celery -A backend worker -l info` (desde backend/, con CELERY_BROKER_URL definido)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+
+app = Celery("backend")
+# Lee CELERY_* de settings (p. ej. CELERY_BROKER_URL) y descubre `<app>/tasks.py`
+app.config_from_object("django.conf:settings", namespace="CELERY")
+app.autodiscover_tasks()
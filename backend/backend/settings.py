@@ -1,4 +1,6 @@
 # backend/settings.py
+import os
+import sys
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -26,8 +28,13 @@ INSTALLED_APPS = [
     
 ]
 
-# Activa debug_toolbar solo si DEBUG
-if DEBUG:
+# Activa debug_toolbar solo si DEBUG y no estamos en un comando de gestión
+# (migrate, shell, test...) ni bajo pytest: ahí sólo añade import y envuelve el cursor.
+_ES_MANAGE_PY = Path(sys.argv[0]).name == "manage.py"
+DEBUG_TOOLBAR = DEBUG and not (
+    "pytest" in sys.modules or (_ES_MANAGE_PY and sys.argv[1:2] != ["runserver"])
+)
+if DEBUG_TOOLBAR:
     INSTALLED_APPS += ["debug_toolbar"]
 
 MIDDLEWARE = [
@@ -44,7 +51,7 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
-if DEBUG:
+if DEBUG_TOOLBAR:
     MIDDLEWARE += ["debug_toolbar.middleware.DebugToolbarMiddleware"]
 
 CORS_ALLOW_ALL_ORIGINS = True  # solo dev
@@ -72,6 +79,19 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Reutiliza conexiones entre peticiones (comprobando que siguen vivas)
+        "CONN_MAX_AGE": 60,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "timeout": 20,
+            # PRAGMAs por conexión: WAL permite lectores concurrentes con un escritor
+            "init_command": (
+                "PRAGMA journal_mode=WAL;"
+                "PRAGMA synchronous=NORMAL;"
+                "PRAGMA mmap_size=268435456;"
+                "PRAGMA cache_size=-64000;"
+            ),
+        },
     }
 }
 
@@ -91,6 +111,15 @@ STATIC_URL = "static/"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Exportaciones en segundo plano: sólo si hay broker explícito (y Celery instalado).
+# Worker: `celery -A backend worker`; la purga horaria de CSV requiere `celery -A backend beat`.
+CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL") or None
+CELERY_BEAT_SCHEDULE = {
+    "limpiar-exportaciones": {"task": "cine.tasks.limpiar_exportaciones", "schedule": 60 * 60},
+}
+# CSV exportados (con emails de clientes): fuera de MEDIA_ROOT, nunca servidos como estáticos
+EXPORTS_ROOT = BASE_DIR / "exports"
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
@@ -109,11 +138,16 @@ REST_FRAMEWORK = {
 }
 
 INTERNAL_IPS = ["127.0.0.1", "localhost"]
-if DEBUG:
-    # Solo para desarrollo, permite ver la toolbar
+if DEBUG and not os.environ.get("DJANGO_SKIP_HOSTNAME_LOOKUP"):
+    # Solo para desarrollo, permite ver la toolbar.
+    # La resolución del hostname usa el resolvedor del sistema (sin timeout
+    # configurable) y puede bloquear segundos: DJANGO_SKIP_HOSTNAME_LOOKUP la omite.
     import socket
-    INTERNAL_IPS += [f"{ip}:8000" for ip in socket.gethostbyname_ex(socket.gethostname())[2]]
-    
+    try:
+        INTERNAL_IPS += [f"{ip}:8000" for ip in socket.gethostbyname_ex(socket.gethostname())[2]]
+    except OSError:
+        pass
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Cine API",
     "DESCRIPTION": "API v1 para gestión de películas, sesiones y entradas.",
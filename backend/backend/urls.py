@@ -4,7 +4,7 @@ from __future__ import annotations
 from django.contrib import admin
 from django.urls import path, include
 from django.http import JsonResponse
-from django.views.decorators.cache import never_cache
+from django.views.decorators.cache import cache_page, never_cache
 from django.conf import settings
 from django.conf.urls.static import static
 
@@ -53,10 +53,20 @@ try:
         SpectacularRedocView,
     )
 
+    # El schema sólo cambia con cada despliegue: se cachea 1 h en lugar de regenerarlo
+    SCHEMA_CACHE_SECONDS = 60 * 60
     urlpatterns += [
-        path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
-        path("api/docs/", SpectacularSwaggerView.as_view(url_name="schema"), name="swagger-ui"),
-        path("api/redoc/", SpectacularRedocView.as_view(url_name="schema"), name="redoc"),
+        path("api/schema/", cache_page(SCHEMA_CACHE_SECONDS)(SpectacularAPIView.as_view()), name="schema"),
+        path(
+            "api/docs/",
+            cache_page(SCHEMA_CACHE_SECONDS)(SpectacularSwaggerView.as_view(url_name="schema")),
+            name="swagger-ui",
+        ),
+        path(
+            "api/redoc/",
+            cache_page(SCHEMA_CACHE_SECONDS)(SpectacularRedocView.as_view(url_name="schema")),
+            name="redoc",
+        ),
     ]
 except Exception:
     # Si no está instalado, simplemente no exponemos docs.
@@ -65,10 +75,11 @@ except Exception:
 
 # ---- Desarrollo: debug toolbar + media ----
 if settings.DEBUG:
-    try:
-        import debug_toolbar  # type: ignore
-        urlpatterns += [path("__debug__/", include(debug_toolbar.urls))]
-    except Exception:
-        pass
+    if getattr(settings, "DEBUG_TOOLBAR", False):
+        try:
+            import debug_toolbar  # type: ignore
+            urlpatterns += [path("__debug__/", include(debug_toolbar.urls))]
+        except Exception:
+            pass
 
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,16 +1,46 @@
 from __future__ import annotations
 
-import csv
 from datetime import timedelta
-from typing import Iterable
 
 from django.contrib import admin, messages
-from django.db.models import Count, F, Q
-from django.http import HttpResponse
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.core.exceptions import PermissionDenied
+from django.core.signing import BadSignature
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.http import FileResponse, Http404
+from django.urls import path
 from django.utils import timezone
 from django.utils.html import format_html
 
+from .exportacion import nombre_exportacion, respuesta_csv_entradas, storage_exportaciones
 from .models import Pelicula, Sesion, Entrada, TicketStatus
+from .tasks import celery_configurado, exportar_entradas_sesiones
+
+
+# =========================
+# Utilidades de anotación
+# =========================
+def _entradas_count_sq(**filtros):
+    """
+    Subconsulta escalar correlacionada que cuenta las entradas de la sesión exterior.
+    Evita el JOIN + COUNT(DISTINCT) sobre `cine_entrada` (una subconsulta por contador).
+    """
+    sq = (
+        Entrada.objects.filter(sesion=OuterRef("pk"), **filtros)
+        .order_by()
+        .values("sesion")
+        .annotate(c=Count("*"))
+        .values("c")
+    )
+    return Coalesce(Subquery(sq), 0)
+
+
+def _es_changelist(request, model_admin) -> bool:
+    """True si la petición es el listado (changelist) del ModelAdmin dado."""
+    match = getattr(request, "resolver_match", None)
+    opts = model_admin.model._meta
+    return bool(match) and match.url_name == f"{opts.app_label}_{opts.model_name}_changelist"
 
 
 # =========================
@@ -30,15 +60,17 @@ class DisponibilidadFilter(admin.SimpleListFilter):
         )
 
     def queryset(self, request, queryset):
-        queryset = queryset.annotate(
-            total_asientos=F("filas") * F("columnas"),
-            ocupados=Count("entradas", distinct=True),
-        )
+        if self.value() not in ("agotada", "disponible"):
+            return queryset
+        # Reutiliza las anotaciones de SesionAdmin.get_queryset si ya existen
+        anotaciones = queryset.query.annotations
+        if "total_asientos" not in anotaciones:
+            queryset = queryset.annotate(total_asientos=F("filas") * F("columnas"))
+        if "entradas_count" not in anotaciones:
+            queryset = queryset.annotate(entradas_count=_entradas_count_sq())
         if self.value() == "agotada":
-            return queryset.filter(ocupados__gte=F("total_asientos"))
-        if self.value() == "disponible":
-            return queryset.filter(ocupados__lt=F("total_asientos"))
-        return queryset
+            return queryset.filter(entradas_count__gte=F("total_asientos"))
+        return queryset.filter(entradas_count__lt=F("total_asientos"))
 
 
 class ProximidadSesionFilter(admin.SimpleListFilter):
@@ -158,26 +190,68 @@ class SesionAdmin(admin.ModelAdmin):
 
     def get_queryset(self, request):
         qs = super().get_queryset(request).select_related("pelicula")
+        if _es_changelist(request, self):
+            # El listado sólo muestra el título: no traemos sinopsis ni póster
+            qs = qs.defer("pelicula__descripcion", "pelicula__poster_url")
         return qs.annotate(
             total_asientos=F("filas") * F("columnas"),
-            entradas_count=Count("entradas", distinct=True),
-            reservadas_count=Count("entradas", filter=Q(entradas__estado=TicketStatus.RESERVADA), distinct=True),
-            pagadas_count=Count("entradas", filter=Q(entradas__estado=TicketStatus.PAGADA), distinct=True),
+            entradas_count=_entradas_count_sq(),
+            reservadas_count=_entradas_count_sq(estado=TicketStatus.RESERVADA),
+            pagadas_count=_entradas_count_sq(estado=TicketStatus.PAGADA),
         )
 
     @admin.display(description="Disponibles", ordering="total_asientos")
     def asientos_disponibles_col(self, obj: Sesion) -> int:
-        total = getattr(obj, "total_asientos", obj.filas * obj.columnas)
-        ocupados = getattr(obj, "entradas_count", obj.entradas.count())
+        # Ojo: getattr(obj, attr, default) evalúa el default siempre → el COUNT
+        # de respaldo sólo se lanza si falta la anotación de get_queryset.
+        total = getattr(obj, "total_asientos", None)
+        if total is None:
+            total = obj.filas * obj.columnas
+        ocupados = getattr(obj, "entradas_count", None)
+        if ocupados is None:
+            ocupados = obj.entradas.count()
         return max(total - ocupados, 0)
 
     @admin.display(description="Reservadas", ordering="reservadas_count")
     def reservadas_col(self, obj: Sesion) -> int:
-        return getattr(obj, "reservadas_count", obj.entradas.filter(estado=TicketStatus.RESERVADA).count())
+        val = getattr(obj, "reservadas_count", None)
+        if val is None:
+            val = obj.entradas.filter(estado=TicketStatus.RESERVADA).count()
+        return val
 
     @admin.display(description="Pagadas", ordering="pagadas_count")
     def pagadas_col(self, obj: Sesion) -> int:
-        return getattr(obj, "pagadas_count", obj.entradas.filter(estado=TicketStatus.PAGADA).count())
+        val = getattr(obj, "pagadas_count", None)
+        if val is None:
+            val = obj.entradas.filter(estado=TicketStatus.PAGADA).count()
+        return val
+
+    # --- Descarga de exportaciones generadas en segundo plano ---
+    def get_urls(self):
+        urls = [
+            path(
+                "exportaciones/<str:token>/",
+                self.admin_site.admin_view(self.descargar_exportacion),
+                name="cine_sesion_exportacion",
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def descargar_exportacion(self, request, token):
+        """
+        Sirve un CSV exportado: sólo staff con permiso de ver sesiones y con un
+        token firmado vigente (ver `firmar_exportacion`).
+        """
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        try:
+            nombre = nombre_exportacion(token)
+        except BadSignature:
+            raise Http404("Enlace de exportación no válido o caducado.")
+        storage = storage_exportaciones()
+        if not storage.exists(nombre):
+            raise Http404("La exportación ya no existe.")
+        return FileResponse(storage.open(nombre, "rb"), as_attachment=True, filename="entradas_sesiones.csv")
 
     # --- Acción CSV: exporta TODAS las entradas de las sesiones seleccionadas ---
     @admin.action(description="Exportar ENTRADAS de sesiones seleccionadas (CSV)")
@@ -186,37 +260,25 @@ class SesionAdmin(admin.ModelAdmin):
         Crea un CSV con las entradas de las sesiones marcadas.
         Columnas: película, inicio, sala, asiento, estado, email, creada_en.
         """
-        sesiones = list(queryset)
-        if not sesiones:
+        # Sólo los ids: no hace falta construir las sesiones (ni sus anotaciones)
+        sesion_ids = list(queryset.values_list("pk", flat=True))
+        if not sesion_ids:
             self.message_user(request, "No hay sesiones seleccionadas.", level=messages.WARNING)
             return
 
+        # Con Celery configurado, la exportación se genera en segundo plano y se envía por email
+        if celery_configurado() and request.user.email:
+            exportar_entradas_sesiones.delay(sesion_ids, request.user.email, request.build_absolute_uri("/"))
+            self.message_user(
+                request,
+                "Exportación en cola: recibirás un email con el enlace en breve.",
+                level=messages.INFO,
+            )
+            return
+
         now_local = timezone.localtime()
         filename = f"entradas_sesiones_{now_local:%Y%m%d_%H%M}.csv"
-        response = HttpResponse(content_type="text/csv; charset=utf-8")
-        response["Content-Disposition"] = f'attachment; filename="{filename}"'
-        # BOM para compatibilidad con Excel
-        response.write("\ufeff")
-        writer = csv.writer(response)
-        writer.writerow(["Pelicula", "Inicio", "Sala", "Asiento", "Estado", "Email", "Creada_en"])
-
-        entradas = (
-            Entrada.objects.filter(sesion__in=sesiones)
-            .select_related("sesion", "sesion__pelicula")
-            .order_by("sesion__inicio", "fila", "numero")
-            .iterator()
-        )
-        for e in entradas:
-            writer.writerow([
-                e.sesion.pelicula.titulo,
-                timezone.localtime(e.sesion.inicio).strftime("%Y-%m-%d %H:%M"),
-                e.sesion.sala,
-                e.etiqueta_asiento,
-                e.estado,
-                e.email or "",
-                timezone.localtime(e.creada_en).strftime("%Y-%m-%d %H:%M"),
-            ])
-        return response
+        return respuesta_csv_entradas(filename, Entrada.objects.filter(sesion_id__in=sesion_ids))
 
 
 # =========================
@@ -240,6 +302,23 @@ class EntradaAdmin(admin.ModelAdmin):
         ("Compra", {"fields": ("estado", "email", "creada_en")}),
     )
 
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        if _es_changelist(request, self):
+            # Sólo las columnas que usan list_display y Sesion.__str__
+            qs = qs.only(
+                "id",
+                "estado",
+                "email",
+                "creada_en",
+                "fila",
+                "numero",
+                "sesion__inicio",
+                "sesion__sala",
+                "sesion__pelicula__titulo",
+            )
+        return qs
+
     @admin.display(description="Asiento", ordering="fila")
     def etiqueta_asiento_col(self, obj: Entrada) -> str:
         return obj.etiqueta_asiento
@@ -250,6 +329,8 @@ class EntradaAdmin(admin.ModelAdmin):
             return "—"
         return format_html('<a href="mailto:{0}">{0}</a>', obj.email)
 
+    # NOTE: acciones en bloque con un único UPDATE; NO disparan pre_save/post_save
+    # ni Entrada.save(). No sustituir por un bucle de .save() (O(N) queries).
     @admin.action(description="Marcar como PAGADAS")
     def marcar_como_pagadas(self, request, queryset):
         updated = queryset.update(estado=TicketStatus.PAGADA)
@@ -263,33 +344,14 @@ class EntradaAdmin(admin.ModelAdmin):
     # --- Acción CSV: exporta las entradas seleccionadas ---
     @admin.action(description="Exportar seleccionadas (CSV)")
     def exportar_csv(self, request, queryset):
-        if not queryset.exists():
+        # Comprobación en Python (sin SELECT extra); el admin ya exige selección.
+        if not request.POST.getlist(ACTION_CHECKBOX_NAME):
             self.message_user(request, "No hay entradas seleccionadas.", level=messages.WARNING)
             return
 
         now_local = timezone.localtime()
         filename = f"entradas_{now_local:%Y%m%d_%H%M}.csv"
-        response = HttpResponse(content_type="text/csv; charset=utf-8")
-        response["Content-Disposition"] = f'attachment; filename="{filename}"'
-        response.write("\ufeff")  # BOM para Excel
-
-        writer = csv.writer(response)
-        writer.writerow(["Pelicula", "Inicio", "Sala", "Asiento", "Estado", "Email", "Creada_en"])
-
-        qs: Iterable[Entrada] = queryset.select_related("sesion", "sesion__pelicula").order_by(
-            "sesion__inicio", "fila", "numero"
-        )
-        for e in qs:
-            writer.writerow([
-                e.sesion.pelicula.titulo,
-                timezone.localtime(e.sesion.inicio).strftime("%Y-%m-%d %H:%M"),
-                e.sesion.sala,
-                e.etiqueta_asiento,
-                e.estado,
-                e.email or "",
-                timezone.localtime(e.creada_en).strftime("%Y-%m-%d %H:%M"),
-            ])
-        return response
+        return respuesta_csv_entradas(filename, queryset)
 
     def get_readonly_fields(self, request, obj: Entrada | None = None):
         ro = list(super().get_readonly_fields(request, obj))
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from django.core.cache import cache
+from django.utils.translation import get_language
+
+
+# =========================
+# Caché del listado público de películas
+# =========================
+PELICULAS_LISTADO_TIMEOUT = 30
+PELICULAS_VERSION_KEY = "cine:peliculas:version"
+
+
+def version_listado_peliculas() -> int:
+    """Versión vigente del listado; forma parte de cada clave cacheada."""
+    return cache.get_or_set(PELICULAS_VERSION_KEY, 1, timeout=None)
+
+
+def clave_listado_peliculas(request) -> str:
+    """Clave por versión + idioma + URL completa (search/ordering/page incluidos)."""
+    return f"cine:peliculas:list:v{version_listado_peliculas()}:{get_language()}:{request.get_full_path()}"
+
+
+def invalidar_listado_peliculas() -> None:
+    """
+    Sube la versión: las claves antiguas dejan de consultarse y caducan solas,
+    sin necesidad de borrar por patrón (no disponible en todos los backends).
+    """
+    try:
+        cache.incr(PELICULAS_VERSION_KEY)
+    except ValueError:
+        # La clave no existía (o fue desalojada): se crea en la siguiente lectura.
+        pass
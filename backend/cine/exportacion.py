@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import csv
+from datetime import timedelta
+from typing import IO, Iterator
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.core.signing import TimestampSigner
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+
+# =========================
+# Exportación CSV de entradas (admin y tareas en segundo plano)
+# =========================
+CSV_CABECERA = ["Pelicula", "Inicio", "Sala", "Asiento", "Estado", "Email", "Creada_en"]
+CSV_FECHA_FMT = "%Y-%m-%d %H:%M"
+
+
+class Echo:
+    """Pseudo-fichero para `csv.writer`: devuelve cada línea en lugar de almacenarla."""
+    def write(self, value: str) -> str:
+        return value
+
+
+def filas_csv_entradas(entradas_qs, tz) -> Iterator[list]:
+    """
+    Genera las filas CSV de un queryset de entradas.
+    Usa `values_list` + `iterator()` para no instanciar modelos ni cargar todo en memoria.
+    Las fechas (aware, USE_TZ=True) se convierten con `astimezone(tz)`, sin
+    resolver la zona horaria por cada celda como haría `timezone.localtime`.
+    """
+    filas = (
+        entradas_qs.order_by("sesion__inicio", "fila", "numero")
+        .values_list(
+            "sesion__pelicula__titulo",
+            "sesion__inicio",
+            "sesion__sala",
+            "fila",
+            "numero",
+            "estado",
+            "email",
+            "creada_en",
+        )
+        .iterator(chunk_size=2000)
+    )
+    for titulo, inicio, sala, fila, numero, estado, email, creada_en in filas:
+        yield [
+            titulo,
+            inicio.astimezone(tz).strftime(CSV_FECHA_FMT),
+            sala,
+            f"{fila}{numero}",
+            estado,
+            email or "",
+            creada_en.astimezone(tz).strftime(CSV_FECHA_FMT),
+        ]
+
+
+def escribir_csv_entradas(fichero: IO[str], entradas_qs) -> None:
+    """Vuelca el CSV completo (BOM + cabecera + filas) en un fichero de texto."""
+    fichero.write("\ufeff")  # BOM para compatibilidad con Excel
+    writer = csv.writer(fichero)
+    writer.writerow(CSV_CABECERA)
+    writer.writerows(filas_csv_entradas(entradas_qs, timezone.get_current_timezone()))
+
+
+def respuesta_csv_entradas(filename: str, entradas_qs) -> StreamingHttpResponse:
+    """
+    Respuesta CSV en streaming: memoria constante y primer byte inmediato.
+    """
+    writer = csv.writer(Echo())
+    # Se resuelve aquí, durante la petición: el generador se consume después.
+    tz = timezone.get_current_timezone()
+
+    def rows() -> Iterator[str]:
+        yield "\ufeff"  # BOM para compatibilidad con Excel
+        yield writer.writerow(CSV_CABECERA)
+        for fila in filas_csv_entradas(entradas_qs, tz):
+            yield writer.writerow(fila)
+
+    response = StreamingHttpResponse(rows(), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+# =========================
+# Exportaciones guardadas (privadas, con enlace firmado)
+# =========================
+EXPORTACION_ENLACE_MAX_AGE = 60 * 60 * 24  # 24 h
+_EXPORTACION_SALT = "cine.exportacion"
+
+
+def storage_exportaciones() -> FileSystemStorage:
+    """
+    Almacenamiento de los CSV generados, fuera de MEDIA_ROOT: contienen emails
+    de clientes y sólo se sirven mediante la vista de descarga del admin.
+    """
+    return FileSystemStorage(location=settings.EXPORTS_ROOT)
+
+
+def firmar_exportacion(nombre: str) -> str:
+    """Token firmado y con fecha para el enlace de descarga."""
+    return TimestampSigner(salt=_EXPORTACION_SALT).sign(nombre)
+
+
+def nombre_exportacion(token: str) -> str:
+    """
+    Nombre del fichero a partir del token. Lanza `BadSignature` (o su subclase
+    `SignatureExpired`) si está manipulado o ha caducado.
+    """
+    return TimestampSigner(salt=_EXPORTACION_SALT).unsign(token, max_age=EXPORTACION_ENLACE_MAX_AGE)
+
+
+def limpiar_exportaciones_caducadas() -> int:
+    """
+    Borra los CSV cuyo enlace ya ha caducado (contienen datos personales y no
+    deben acumularse). Devuelve cuántos ficheros se han eliminado.
+    """
+    storage = storage_exportaciones()
+    try:
+        _, ficheros = storage.listdir("")
+    except FileNotFoundError:
+        return 0
+    limite = timezone.now() - timedelta(seconds=EXPORTACION_ENLACE_MAX_AGE)
+    borrados = 0
+    for nombre in ficheros:
+        if storage.get_modified_time(nombre) < limite:
+            storage.delete(nombre)
+            borrados += 1
+    return borrados
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-15 21:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cine', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='entrada',
+            index=models.Index(fields=['-creada_en'], name='entrada_creada_en_idx'),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import re
+
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
@@ -21,6 +23,19 @@ class TicketStatus(models.TextChoices):
     PAGADA = "pagada", _("pagada")
 
 
+# Fila válida tras normalizar a mayúsculas. `clean()` la usa directamente (ruta
+# caliente); el RegexValidator del campo se mantiene para formularios.
+_FILA_RE = re.compile(r"[A-Z]")
+
+# Campos que determinan el asiento de una entrada
+_CAMPOS_ASIENTO = frozenset({"sesion", "sesion_id", "fila", "numero"})
+
+# (filas, columnas) por sesion_id para validar entradas sin un SELECT por entrada.
+# Se vacía al terminar cada petición y se invalida al guardar/borrar una sesión
+# (ver cine/signals.py).
+_dims_cache: dict[int, tuple[int, int]] = {}
+
+
 class Pelicula(models.Model):
     """
     Película proyectada en el cine.
@@ -66,6 +81,27 @@ class Pelicula(models.Model):
         return self.titulo
 
 
+class SesionQuerySet(models.QuerySet):
+    """QuerySet de sesiones con utilidades de anotación."""
+
+    def with_counts(self) -> "SesionQuerySet":
+        """
+        Anota `entradas_count`, `reservadas_count` y `pagadas_count` para que
+        propiedades y serializers no lancen un COUNT por sesión (1 query para K sesiones).
+        La capacidad no se anota: depende de filas/columnas, que pueden cambiar
+        en la misma petición (PUT/PATCH), y se calcula en Python sin coste.
+
+        Los tres contadores comparten un único LEFT JOIN con `entradas` y se
+        resuelven en la misma pasada con agregados condicionales; sin `distinct`,
+        porque una sola relación 1:N no duplica filas.
+        """
+        return self.annotate(
+            entradas_count=models.Count("entradas"),
+            reservadas_count=models.Count("entradas", filter=models.Q(entradas__estado=TicketStatus.RESERVADA)),
+            pagadas_count=models.Count("entradas", filter=models.Q(entradas__estado=TicketStatus.PAGADA)),
+        )
+
+
 class Sesion(models.Model):
     """
     Proyección de una película en una sala, fecha y hora concretas.
@@ -103,6 +139,8 @@ class Sesion(models.Model):
         help_text=_("Asientos por fila (p. ej., 12 → 1-12). Debe ser ≥ 1."),
     )
 
+    objects = SesionQuerySet.as_manager()
+
     class Meta:
         verbose_name = _("sesión")
         verbose_name_plural = _("sesiones")
@@ -122,6 +160,9 @@ class Sesion(models.Model):
         return f"{self.pelicula.titulo} @ {self.inicio:%Y-%m-%d %H:%M}"
 
     # --- Utilidades de capacidad ---
+    # Si el queryset viene de `with_counts()`, se reutiliza el COUNT anotado.
+    # La capacidad se calcula siempre en Python: tras editar filas/columnas
+    # una anotación previa quedaría obsoleta.
     @property
     def asientos_totales(self) -> int:
         """Cantidad total de asientos disponibles en la sala para esta sesión."""
@@ -130,7 +171,8 @@ class Sesion(models.Model):
     @property
     def asientos_vendidos_o_reservados(self) -> int:
         """Entradas ya registradas (reservadas o pagadas)."""
-        return self.entradas.count()
+        count = getattr(self, "entradas_count", None)
+        return self.entradas.count() if count is None else count
 
     @property
     def asientos_disponibles(self) -> int:
@@ -184,6 +226,8 @@ class Entrada(models.Model):
         verbose_name_plural = _("entradas")
         ordering = ["-creada_en"]
         constraints = [
+            # Su índice único (sesion, fila, numero) ya sirve los ORDER BY fila/numero
+            # por sesión (exportación CSV, mapa de asientos): no hace falta otro índice.
             models.UniqueConstraint(
                 fields=["sesion", "fila", "numero"],
                 name="unique_asiento_por_sesion",
@@ -191,6 +235,8 @@ class Entrada(models.Model):
         ]
         indexes = [
             models.Index(fields=["sesion", "estado"], name="entrada_sesion_estado_idx"),
+            # Paginación por cursor de la API (`WHERE creada_en < … ORDER BY -creada_en`)
+            models.Index(fields=["-creada_en"], name="entrada_creada_en_idx"),
         ]
 
     # --- Validaciones de dominio ---
@@ -210,9 +256,13 @@ class Entrada(models.Model):
         if self.fila:
             self.fila = self.fila.upper()
 
+        dims = self._dimensiones_sesion()
+        if dims is None:
+            raise ValidationError({"sesion": _("La sesión indicada no existe.")})
+        max_fila_index, max_columnas = dims  # filas: 1 → A, 2 → A-B, etc.
+
         # Rango de filas permitido según la sesión (A..).
-        max_fila_index = int(self.sesion.filas)  # 1 → A, 2 → A-B, etc.
-        if not self.fila or len(self.fila) != 1 or not ("A" <= self.fila <= "Z"):
+        if not self.fila or not _FILA_RE.fullmatch(self.fila):
             raise ValidationError({"fila": _("La fila debe ser una única letra A-Z.")})
 
         fila_index = (ord(self.fila) - ord("A")) + 1
@@ -222,18 +272,39 @@ class Entrada(models.Model):
             )
 
         # Validación dinámica del número de asiento
-        max_columnas = int(self.sesion.columnas)
         if self.numero < 1 or self.numero > max_columnas:
             raise ValidationError(
                 {"numero": _(f"El asiento debe estar entre 1 y {max_columnas} para esta sesión.")}
             )
 
+    def _dimensiones_sesion(self) -> tuple[int, int] | None:
+        """
+        (filas, columnas) de la sesión asociada, o None si no existe.
+        Reutiliza la sesión si ya está cargada; si no, consulta `_dims_cache`
+        y sólo en último caso lee esas dos columnas (1 query por sesión distinta).
+        """
+        if Entrada.sesion.is_cached(self):
+            return int(self.sesion.filas), int(self.sesion.columnas)
+
+        dims = _dims_cache.get(self.sesion_id)
+        if dims is None:
+            dims = Sesion.objects.filter(pk=self.sesion_id).values_list("filas", "columnas").first()
+            if dims is not None:
+                _dims_cache[self.sesion_id] = dims
+        return dims
+
     def save(self, *args, **kwargs):
         """
-        Llama a `full_clean()` antes de guardar para asegurar validaciones de negocio,
-        especialmente los rangos de fila/columna dependientes de la sesión.
+        Llama a `clean()` antes de guardar para asegurar las validaciones de negocio
+        (rangos de fila/columna dependientes de la sesión).
+
+        No usa `full_clean()`: los validadores de campo ya corren en formularios y
+        serializers, y la unicidad del asiento la garantiza la constraint de BD.
+        Si `update_fields` no toca el asiento (p. ej. sólo `estado`), no se valida.
         """
-        self.full_clean()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or _CAMPOS_ASIENTO & set(update_fields):
+            self.clean()
         return super().save(*args, **kwargs)
 
     # --- Presentación ---
@@ -0,0 +1,13 @@
+from __future__ import annotations
+
+from rest_framework.pagination import CursorPagination
+
+
+class EntradaCursorPagination(CursorPagination):
+    """
+    Paginación por cursor para entradas (tabla que más crece).
+    Evita el COUNT(*) y el OFFSET de PageNumberPagination: cada página es un
+    `WHERE creada_en < cursor` servido por índice, sin importar lo lejos que esté.
+    """
+    ordering = "-creada_en"
+    page_size = 25
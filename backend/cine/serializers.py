@@ -1,19 +1,29 @@
 from __future__ import annotations
 
+import copy
+
 from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
-from rest_framework.validators import UniqueTogetherValidator
 
 from .models import Pelicula, Sesion, Entrada, TicketStatus
 
 
+ASIENTO_OCUPADO_MSG = "Asiento ya reservado o pagado para esa sesión."
+
+# Campos de la película anidada en sesiones (serializer y `.only()` de las vistas)
+PELICULA_MINI_FIELDS = ("id", "titulo", "duracion_min")
+
+# Letra de fila → índice 1-based (A=1 … Z=26)
+_FILA_INDEX = {chr(c): c - 64 for c in range(65, 91)}
+
+
 # =========================
 # Mixin: convierte ValidationError del modelo en errores DRF (400)
 # =========================
 class ModelCleanErrorMixin:
     """
-    Envuelve create/update para capturar DjangoValidationError (del model.full_clean/save)
-    y transformarlo en serializers.ValidationError (HTTP 400).
+    Envuelve create/update para capturar DjangoValidationError (de `clean()`, que
+    `Entrada.save()` invoca) y transformarlo en serializers.ValidationError (HTTP 400).
     """
     def create(self, validated_data):
         try:
@@ -30,10 +40,31 @@ class ModelCleanErrorMixin:
             raise serializers.ValidationError(detail)
 
 
+# =========================
+# Mixin: caché por clase de los fields generados
+# =========================
+class CachedFieldsMixin:
+    """
+    Cachea por clase el resultado de `get_fields()` (en ModelSerializer implica
+    introspección del modelo y deepcopy de los fields declarados) y devuelve
+    copias superficiales, que son las que DRF enlaza (`bind`) a cada instancia.
+
+    Sólo válido para serializers cuyos fields no dependan del contexto/petición.
+    """
+    _fields_cache: dict[type, dict] = {}
+
+    def get_fields(self):
+        cls = type(self)
+        plantilla = CachedFieldsMixin._fields_cache.get(cls)
+        if plantilla is None:
+            plantilla = CachedFieldsMixin._fields_cache[cls] = super().get_fields()
+        return {nombre: copy.copy(field) for nombre, field in plantilla.items()}
+
+
 # =========================
 # Película
 # =========================
-class PeliculaSerializer(ModelCleanErrorMixin, serializers.ModelSerializer):
+class PeliculaSerializer(CachedFieldsMixin, ModelCleanErrorMixin, serializers.ModelSerializer):
     """
     Serializer de películas con el display human-readable de la clasificación.
     """
@@ -55,20 +86,33 @@ class PeliculaSerializer(ModelCleanErrorMixin, serializers.ModelSerializer):
         read_only_fields = ("id",)
 
 
+class PeliculaMiniSerializer(CachedFieldsMixin, serializers.ModelSerializer):
+    """
+    Película reducida para anidar en sesiones: sin descripción ni póster,
+    que pesan por fila y el cliente ya obtiene del listado de películas.
+    """
+    class Meta:
+        model = Pelicula
+        fields = PELICULA_MINI_FIELDS
+        read_only_fields = PELICULA_MINI_FIELDS
+
+
 # =========================
 # Sesión
 # =========================
-class SesionSerializer(ModelCleanErrorMixin, serializers.ModelSerializer):
+class SesionSerializer(CachedFieldsMixin, ModelCleanErrorMixin, serializers.ModelSerializer):
     """
     Serializer de sesiones.
-    - `pelicula` anidada (solo lectura) + `pelicula_id` para escritura.
+    - `pelicula` anidada reducida (solo lectura) + `pelicula_id` para escritura.
     - Totales/disponibles provienen de propiedades del modelo.
     - `reservadas` y `pagadas` intentan usar anotaciones del queryset; si no hay,
       calculan con COUNT (útil para detalle).
     """
-    pelicula = PeliculaSerializer(read_only=True)
+    pelicula = PeliculaMiniSerializer(read_only=True)
+    # Sólo las columnas que la respuesta de create/update anida: con `.only("id")`
+    # cada campo diferido costaría un SELECT al serializar `pelicula`.
     pelicula_id = serializers.PrimaryKeyRelatedField(
-        queryset=Pelicula.objects.all(),
+        queryset=Pelicula.objects.only(*PELICULA_MINI_FIELDS),
         source="pelicula",
         write_only=True,
         help_text="ID de la película a proyectar.",
@@ -98,38 +142,61 @@ class SesionSerializer(ModelCleanErrorMixin, serializers.ModelSerializer):
         read_only_fields = ("id", "asientos_totales", "asientos_disponibles", "reservadas", "pagadas")
 
     def get_reservadas(self, obj: Sesion) -> int:
-        # Si la vista anotó reservadas_count, la usamos; si no, COUNT directo.
-        return getattr(obj, "reservadas_count", obj.entradas.filter(estado=TicketStatus.RESERVADA).count())
+        # Si la vista anotó reservadas_count, la usamos; si no, COUNT directo
+        # (sólo entonces: un default de getattr se evaluaría siempre) y se memoriza.
+        val = getattr(obj, "reservadas_count", None)
+        if val is None:
+            val = obj.reservadas_count = obj.entradas.filter(estado=TicketStatus.RESERVADA).count()
+        return val
 
     def get_pagadas(self, obj: Sesion) -> int:
-        return getattr(obj, "pagadas_count", obj.entradas.filter(estado=TicketStatus.PAGADA).count())
+        val = getattr(obj, "pagadas_count", None)
+        if val is None:
+            val = obj.pagadas_count = obj.entradas.filter(estado=TicketStatus.PAGADA).count()
+        return val
 
 
 # =========================
 # Entrada
 # =========================
-class EntradaSerializer(ModelCleanErrorMixin, serializers.ModelSerializer):
+class SesionRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PK de sesión que memoriza en el contexto las sesiones ya resueltas: en
+    validaciones `many=True` (reserva en bloque) hace un SELECT por sesión
+    distinta en lugar de uno por entrada.
+    """
+    def to_internal_value(self, data):
+        cache = self.context.setdefault("_sesiones_resueltas", {})
+        clave = str(data)
+        if clave not in cache:
+            cache[clave] = super().to_internal_value(data)
+        return cache[clave]
+
+
+class EntradaSerializer(CachedFieldsMixin, ModelCleanErrorMixin, serializers.ModelSerializer):
     """
     Serializer de entradas con validaciones amigables:
     - Normaliza `fila` a mayúscula.
     - Valida (temprano) que el asiento exista dentro de la cuadrícula de la sesión.
       (El modelo ya valida; aquí damos error 400 antes y con mejor mensaje.)
-    - Evita asientos duplicados vía UniqueTogetherValidator.
+    - Asientos duplicados: los rechaza la constraint de BD (409 en la vista).
     - Protege asientos si la entrada está pagada (no se pueden mover).
     """
-    etiqueta_asiento = serializers.CharField(read_only=True)
+    sesion = SesionRelatedField(queryset=Sesion.objects.all())
+    etiqueta_asiento = serializers.SerializerMethodField()
 
     class Meta:
         model = Entrada
         fields = ("id", "sesion", "fila", "numero", "email", "estado", "creada_en", "etiqueta_asiento")
         read_only_fields = ("id", "creada_en", "etiqueta_asiento")
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Entrada.objects.all(),
-                fields=("sesion", "fila", "numero"),
-                message="Ese asiento ya está reservado o pagado para esa sesión.",
-            )
-        ]
+        # Sin UniqueTogetherValidator: la unicidad del asiento la resuelve la
+        # constraint de BD en el INSERT (la vista traduce la IntegrityError a 409).
+        validators = []
+
+    def get_etiqueta_asiento(self, obj: Entrada) -> str:
+        # Anotada en SQL por EntradaViewSet.get_queryset; si no, la propiedad del modelo.
+        etiqueta = getattr(obj, "etiqueta_asiento_sql", None)
+        return obj.etiqueta_asiento if etiqueta is None else etiqueta
 
     # Normaliza la letra de la fila
     def validate_fila(self, value: str) -> str:
@@ -146,17 +213,18 @@ class EntradaSerializer(ModelCleanErrorMixin, serializers.ModelSerializer):
         # Solo validamos si tenemos los 3 valores
         if sesion and fila and numero:
             fila = fila.upper()
-            # A-Z simple
-            if len(fila) != 1 or not ("A" <= fila <= "Z"):
+            # A-Z simple: un único lookup (cubre también longitud != 1)
+            index = _FILA_INDEX.get(fila)
+            if index is None:
                 raise serializers.ValidationError({"fila": "La fila debe ser una única letra A-Z."})
 
             max_filas = int(sesion.filas)
-            index = (ord(fila) - ord("A")) + 1
-            if index < 1 or index > max_filas:
+            if index > max_filas:
                 raise serializers.ValidationError({"fila": f"La fila {fila} no existe en esta sesión (máx: {max_filas})."})
 
             max_cols = int(sesion.columnas)
-            if int(numero) < 1 or int(numero) > max_cols:
+            numero = int(numero)
+            if numero < 1 or numero > max_cols:
                 raise serializers.ValidationError({"numero": f"El asiento debe estar entre 1 y {max_cols}."})
 
             # Reescribimos la fila normalizada
@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from django.core.signals import request_finished
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import models
+from .cache import invalidar_listado_peliculas
+
+
+@receiver(request_finished, dispatch_uid="cine_limpiar_dims_cache")
+def limpiar_dims_cache(sender, **kwargs):
+    """Evita que la caché de dimensiones de sesión sobreviva entre peticiones."""
+    models._dims_cache.clear()
+
+
+@receiver([post_save, post_delete], sender=models.Sesion, dispatch_uid="cine_invalidar_dims_sesion")
+def invalidar_dims_sesion(sender, instance, **kwargs):
+    """Una sesión creada, editada o borrada no debe validar con dimensiones antiguas."""
+    models._dims_cache.pop(instance.pk, None)
+
+
+@receiver([post_save, post_delete], sender=models.Pelicula, dispatch_uid="cine_invalidar_listado_peliculas")
+def invalidar_cache_peliculas(sender, **kwargs):
+    """Cualquier cambio en películas (API, admin o shell) invalida el listado cacheado."""
+    invalidar_listado_peliculas()
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import tempfile
+import uuid
+
+from django.conf import settings
+from django.core.files import File
+from django.core.mail import send_mail
+from django.urls import reverse
+
+from .exportacion import (
+    escribir_csv_entradas,
+    firmar_exportacion,
+    limpiar_exportaciones_caducadas,
+    storage_exportaciones,
+)
+from .models import Entrada
+
+# Celery es opcional: sin él, el admin sigue exportando en streaming.
+try:
+    from celery import shared_task
+except ImportError:  # pragma: no cover - depende del entorno
+    shared_task = None
+
+CELERY_DISPONIBLE = shared_task is not None
+
+
+def celery_configurado() -> bool:
+    """
+    Celery importable *y* con broker configurado explícitamente. Que el paquete
+    esté instalado (p. ej. como dependencia transitiva) no basta: sin broker,
+    `.delay()` intentaría el amqp://localhost por defecto.
+    """
+    return CELERY_DISPONIBLE and bool(getattr(settings, "CELERY_BROKER_URL", None))
+
+
+def exportar_entradas_sesiones(sesion_ids: list[int], email: str, base_url: str = "") -> str:
+    """
+    Genera el CSV de entradas de las sesiones indicadas en `EXPORTS_ROOT` (privado)
+    y envía por email un enlace firmado al admin, válido 24 h. Devuelve el nombre
+    del fichero guardado. De paso purga las exportaciones ya caducadas.
+    """
+    limpiar_exportaciones_caducadas()
+    with tempfile.TemporaryFile("w+", encoding="utf-8", newline="") as tmp:
+        escribir_csv_entradas(tmp, Entrada.objects.filter(sesion_id__in=sesion_ids))
+        tmp.seek(0)
+        nombre = storage_exportaciones().save(f"{uuid.uuid4().hex}.csv", File(tmp))
+
+    ruta = reverse("admin:cine_sesion_exportacion", args=[firmar_exportacion(nombre)])
+    enlace = f"{base_url.rstrip('/')}{ruta}"
+    send_mail(
+        subject="Exportación de entradas lista",
+        message=(
+            "Puedes descargar el CSV de entradas aquí (requiere sesión de staff, "
+            f"caduca en 24 h):\n{enlace}"
+        ),
+        from_email=None,
+        recipient_list=[email],
+    )
+    return nombre
+
+
+def limpiar_exportaciones() -> int:
+    """Tarea periódica (CELERY_BEAT_SCHEDULE): purga los CSV con enlace caducado."""
+    return limpiar_exportaciones_caducadas()
+
+
+if CELERY_DISPONIBLE:
+    exportar_entradas_sesiones = shared_task(exportar_entradas_sesiones)
+    limpiar_exportaciones = shared_task(limpiar_exportaciones)
@@ -1,17 +1,48 @@
 from __future__ import annotations
 
+import functools
+import hashlib
+
 import django_filters
+from django.core.cache import cache
 from django.db import IntegrityError, transaction
-from django.db.models import Count, Q
-from django.utils import timezone
+from django.db.models import CharField, Exists, OuterRef, Q
+from django.db.models.functions import Cast, Concat
+from django.utils.http import parse_etags, quote_etag
 
-from rest_framework import viewsets, mixins, status, filters, serializers
+from rest_framework import viewsets, mixins, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, AllowAny
 
+from .cache import PELICULAS_LISTADO_TIMEOUT, clave_listado_peliculas
 from .models import Pelicula, Sesion, Entrada, TicketStatus
-from .serializers import PeliculaSerializer, SesionSerializer, EntradaSerializer
+from .pagination import EntradaCursorPagination
+from .serializers import ASIENTO_OCUPADO_MSG, PELICULA_MINI_FIELDS, PeliculaSerializer, SesionSerializer, EntradaSerializer
+
+
+# Letras de fila precomputadas (A..Z) para el mapa de asientos.
+_ROW_LETTERS = tuple(chr(65 + i) for i in range(26))
+
+
+def _letras_filas(filas: int):
+    """Letras de las `filas` primeras filas; más allá de la Z se calculan al vuelo."""
+    if filas <= len(_ROW_LETTERS):
+        return _ROW_LETTERS[:filas]
+    return _ROW_LETTERS + tuple(chr(65 + i) for i in range(len(_ROW_LETTERS), filas))
+
+
+@functools.lru_cache(maxsize=64)
+def _plantilla_layout(filas: int, columnas: int, clave: str, defecto) -> tuple[tuple[dict, ...], ...]:
+    """
+    Layout "todo libre" de una sala filas×columnas, calculado una vez por tamaño.
+    Es compartido entre peticiones: quien lo use debe copiar las celdas.
+    """
+    numeros = range(1, columnas + 1)
+    return tuple(
+        tuple({"fila": letra, "numero": n, clave: defecto} for n in numeros)
+        for letra in _letras_filas(filas)
+    )
 
 
 # =========================
@@ -22,13 +53,20 @@ class SesionFilter(django_filters.FilterSet):
     Filtros para Sesión:
     - por película y sala
     - por rango de fecha/hora (inicio_after / inicio_before)
+    - con/sin alguna entrada reservada (tiene_reservas)
     """
     inicio_after = django_filters.IsoDateTimeFilter(field_name="inicio", lookup_expr="gte")
     inicio_before = django_filters.IsoDateTimeFilter(field_name="inicio", lookup_expr="lte")
+    tiene_reservas = django_filters.BooleanFilter(method="filter_tiene_reservas")
 
     class Meta:
         model = Sesion
-        fields = ("pelicula", "sala", "inicio_after", "inicio_before")
+        fields = ("pelicula", "sala", "inicio_after", "inicio_before", "tiene_reservas")
+
+    def filter_tiene_reservas(self, queryset, name, value):
+        # EXISTS se detiene en la primera entrada reservada; no usar `reservadas_count > 0`.
+        reservas = Entrada.objects.filter(sesion=OuterRef("pk"), estado=TicketStatus.RESERVADA)
+        return queryset.filter(Exists(reservas)) if value else queryset.filter(~Exists(reservas))
 
 
 class EntradaFilter(django_filters.FilterSet):
@@ -51,7 +89,10 @@ class EntradaFilter(django_filters.FilterSet):
 # Películas
 # =========================
 class PeliculaViewSet(viewsets.ModelViewSet):
-    """CRUD de películas."""
+    """
+    CRUD de películas. El listado (público) se cachea 30 s por URL + query string;
+    cualquier alta/edición/borrado (API o admin) invalida la caché subiendo su versión.
+    """
     queryset = Pelicula.objects.all()
     serializer_class = PeliculaSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
@@ -60,6 +101,16 @@ class PeliculaViewSet(viewsets.ModelViewSet):
     ordering_fields = ("titulo", "duracion_min")
     ordering = ("titulo",)
 
+    def list(self, request, *args, **kwargs):
+        # Se cachean los datos ya serializados: un acierto se salta la query y el
+        # serializer; el render sigue respetando la negociación por `Accept`.
+        clave = clave_listado_peliculas(request)
+        datos = cache.get(clave)
+        if datos is None:
+            datos = super().list(request, *args, **kwargs).data
+            cache.set(clave, datos, PELICULAS_LISTADO_TIMEOUT)
+        return Response(datos)
+
 
 # =========================
 # Sesiones
@@ -82,13 +133,15 @@ class SesionViewSet(viewsets.ModelViewSet):
     ordering = ("-inicio",)
 
     def get_queryset(self):
+        if self.action == "asientos":
+            # El mapa sólo necesita la cuadrícula: ni contadores ni JOIN con película
+            return Sesion.objects.only("pelicula", "filas", "columnas")
         # Anotamos recuentos por estado para que el serializer los aproveche sin N+1
+        # De la película sólo se leen las columnas que anida PeliculaMiniSerializer.
         return (
             Sesion.objects.select_related("pelicula")
-            .annotate(
-                reservadas_count=Count("entradas", filter=Q(entradas__estado=TicketStatus.RESERVADA), distinct=True),
-                pagadas_count=Count("entradas", filter=Q(entradas__estado=TicketStatus.PAGADA), distinct=True),
-            )
+            .only("inicio", "sala", "filas", "columnas", "pelicula", *(f"pelicula__{f}" for f in PELICULA_MINI_FIELDS))
+            .with_counts()
         )
 
     @action(detail=True, methods=["get"])
@@ -98,27 +151,46 @@ class SesionViewSet(viewsets.ModelViewSet):
         Query param:
           - include=estado → 'estado' ∈ {'libre','reservada','pagada'}
           - si se omite → 'ocupado' ∈ {true,false}
+
+        Responde con ETag derivado de la cuadrícula y de las propias entradas
+        (fila, número, estado): cualquier alta, baja, pago o cambio de asiento lo
+        modifica. Con `If-None-Match` coincidente devuelve 304 sin construir el
+        layout ni renderizar.
         """
         sesion: Sesion = self.get_object()
         include = request.query_params.get("include")
+        filas, columnas = sesion.filas, sesion.columnas
 
-        entradas_qs = Entrada.objects.filter(sesion=sesion).values_list("fila", "numero", "estado")
+        # Orden por (fila, numero): lo sirve el índice único (sesion, fila, numero)
+        # sin ordenación extra y hace el hash estable entre peticiones.
+        entradas = list(
+            Entrada.objects.filter(sesion_id=sesion.id)
+            .values_list("fila", "numero", "estado")
+            .order_by("fila", "numero")
+        )
+
+        firma = hashlib.md5(
+            f"{sesion.id}:{sesion.pelicula_id}:{filas}x{columnas}:{include}".encode(),
+            usedforsecurity=False,
+        )
+        for fila, numero, estado in entradas:
+            firma.update(f"|{fila}{numero}:{estado}".encode())
+        etag = quote_etag(firma.hexdigest())
+        cabeceras = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=cabeceras)
+
+        # Esqueleto del layout cacheado por tamaño de sala: se copia celda a celda
+        # (la plantilla no se muta) y sólo se rellenan los asientos ocupados.
         if include == "estado":
-            estado_map = {(fila, num): estado for (fila, num, estado) in entradas_qs}
+            clave, plantilla = "estado", _plantilla_layout(filas, columnas, "estado", "libre")
         else:
-            ocupados = {(fila, num) for (fila, num, _estado) in entradas_qs}
-
-        layout = []
-        for i in range(sesion.filas):
-            fila_letra = chr(ord("A") + i)
-            fila = []
-            for col in range(1, sesion.columnas + 1):
-                if include == "estado":
-                    estado = estado_map.get((fila_letra, col), None)
-                    fila.append({"fila": fila_letra, "numero": col, "estado": estado or "libre"})
-                else:
-                    fila.append({"fila": fila_letra, "numero": col, "ocupado": (fila_letra, col) in ocupados})
-            fila and layout.append(fila)
+            clave, plantilla = "ocupado", _plantilla_layout(filas, columnas, "ocupado", False)
+        layout = [[celda.copy() for celda in fila_plantilla] for fila_plantilla in plantilla]
+        for fila, numero, estado in entradas:
+            i, j = ord(fila) - 65, numero - 1
+            if 0 <= i < filas and 0 <= j < columnas:
+                layout[i][j][clave] = estado if include == "estado" else True
 
         return Response({
             "sesion": sesion.id,
@@ -126,13 +198,16 @@ class SesionViewSet(viewsets.ModelViewSet):
             "filas": sesion.filas,
             "columnas": sesion.columnas,
             "layout": layout,
-            "generado_en": timezone.now().isoformat(),
-        })
+        }, headers=cabeceras)
 
 
 # =========================
 # Entradas (Checkout invitado)
 # =========================
+# Máximo de asientos por petición en POST /entradas/bulk/
+BULK_MAX_ENTRADAS = 50
+
+
 class EntradaViewSet(
     mixins.CreateModelMixin,
     mixins.DestroyModelMixin,
@@ -144,52 +219,107 @@ class EntradaViewSet(
     Gestión de entradas (reservas/pagos) SIN autenticación:
     - POST /entradas/  → crear reserva
       *Conflictos de asiento* → 409.
+    - POST /entradas/bulk/ → reservar varios asientos en un solo INSERT.
     - POST /entradas/{id}/pagar → marcar como pagada (idempotente).
+    - GET /entradas/ → paginación por cursor (`?cursor=`), sin COUNT(*).
     """
     serializer_class = EntradaSerializer
     permission_classes = (AllowAny,)  # ← checkout como invitado
+    pagination_class = EntradaCursorPagination
     filter_backends = (django_filters.rest_framework.DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter)
     filterset_class = EntradaFilter
     search_fields = ("email", "sesion__pelicula__titulo", "sesion__sala")
-    ordering_fields = ("creada_en", "estado")
+    # Sólo `creada_en`: CursorPagination pagina por la ordenación del OrderingFilter,
+    # y una columna con pocos valores (estado) agota `offset_cutoff` y no termina.
+    ordering_fields = ("creada_en",)
     ordering = ("-creada_en",)
 
     def get_queryset(self):
-        return Entrada.objects.select_related("sesion", "sesion__pelicula").all()
+        # El serializer sólo expone `sesion` como id: no hace falta el JOIN con
+        # sesión/película. La etiqueta del asiento se calcula en SQL.
+        return Entrada.objects.annotate(
+            etiqueta_asiento_sql=Concat("fila", Cast("numero", output_field=CharField()), output_field=CharField()),
+        )
 
-    @transaction.atomic
     def create(self, request, *args, **kwargs):
         """
         Crea una entrada de forma transaccional.
         Si hay colisión por constraint (mismo asiento), responde 409.
+
+        No hay SELECT previo de unicidad: la constraint `unique_asiento_por_sesion`
+        decide en el propio INSERT y su IntegrityError se traduce a 409.
+        La IntegrityError se captura fuera del bloque atómico, que ya se ha
+        deshecho: nunca se sigue usando una transacción abortada.
         """
         try:
-            return super().create(request, *args, **kwargs)
-        except serializers.ValidationError as e:
-            # UniqueTogetherValidator → ValidationError con non_field_errors: [...]
-            detail = e.detail
-            if isinstance(detail, dict) and "non_field_errors" in detail:
-                msgs = [str(m) for m in detail["non_field_errors"]]
-                msg = msgs[0] if msgs else "Asiento ya reservado o pagado para esa sesión."
-                return Response({"detail": msg}, status=status.HTTP_409_CONFLICT)
-            raise
+            with transaction.atomic():
+                return super().create(request, *args, **kwargs)
         except IntegrityError:
             return Response(
-                {"detail": "Asiento ya reservado o pagado para esa sesión."},
+                {"detail": ASIENTO_OCUPADO_MSG, "non_field_errors": [ASIENTO_OCUPADO_MSG]},
                 status=status.HTTP_409_CONFLICT,
             )
 
+    @action(detail=False, methods=["post"])
+    @transaction.atomic
+    def bulk(self, request):
+        """
+        Reserva varios asientos con un único INSERT (ON CONFLICT DO NOTHING).
+        Body: lista de entradas con el mismo formato que POST /entradas/.
+        Respuesta: {"creadas": [...], "conflictos": [...]} con
+          201 si se crearon todas, 207 si sólo algunas y 409 si ninguna.
+        """
+        serializer = self.get_serializer(
+            data=request.data, many=True, allow_empty=False, max_length=BULK_MAX_ENTRADAS
+        )
+        serializer.is_valid(raise_exception=True)
+
+        objs = [Entrada(**datos) for datos in serializer.validated_data]
+        Entrada.objects.bulk_create(objs, ignore_conflicts=True)
+
+        # ignore_conflicts no devuelve pks: nuestras filas son las que conservan
+        # el `creada_en` asignado en memoria; el resto ya estaban ocupadas.
+        asientos = Q()
+        for obj in objs:
+            asientos |= Q(sesion_id=obj.sesion_id, fila=obj.fila, numero=obj.numero)
+        guardadas = {(e.sesion_id, e.fila, e.numero): e for e in Entrada.objects.filter(asientos)}
+
+        creadas, conflictos, vistos = [], [], set()
+        for obj in objs:
+            clave = (obj.sesion_id, obj.fila, obj.numero)
+            entrada = guardadas.get(clave)
+            if clave not in vistos and entrada is not None and entrada.creada_en == obj.creada_en:
+                creadas.append(entrada)
+            else:
+                conflictos.append(
+                    {"sesion": obj.sesion_id, "fila": obj.fila, "numero": obj.numero, "detail": ASIENTO_OCUPADO_MSG}
+                )
+            vistos.add(clave)
+
+        if not conflictos:
+            codigo = status.HTTP_201_CREATED
+        elif creadas:
+            codigo = status.HTTP_207_MULTI_STATUS
+        else:
+            codigo = status.HTTP_409_CONFLICT
+        return Response(
+            {"creadas": self.get_serializer(creadas, many=True).data, "conflictos": conflictos},
+            status=codigo,
+        )
+
     @action(detail=True, methods=["post"])
     @transaction.atomic
     def pagar(self, request, pk=None):
-        """Marca una entrada como PAGADA (idempotente)."""
-        entrada: Entrada = self.get_object()
-
-        if entrada.estado == TicketStatus.PAGADA:
-            serializer = self.get_serializer(entrada)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+        """
+        Marca una entrada como PAGADA (idempotente).
 
+        Primero `get_object()` (filtros y permisos de la vista: nunca se escribe
+        una fila que la vista no devolvería) y después un UPDATE condicional
+        (`WHERE id=… AND estado<>'pagada'`) en lugar de save(): atómico frente a
+        pagos concurrentes y sin validar el modelo.
+        """
+        entrada: Entrada = self.get_object()
+        Entrada.objects.filter(pk=entrada.pk).exclude(estado=TicketStatus.PAGADA).update(estado=TicketStatus.PAGADA)
         entrada.estado = TicketStatus.PAGADA
-        entrada.save(update_fields=["estado"])
         serializer = self.get_serializer(entrada)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -4,6 +4,7 @@ from __future__ import annotations
 from typing import Callable
 
 import pytest
+from django.core.cache import cache
 from django.urls import reverse as dj_reverse
 from rest_framework.test import APIClient
 
@@ -19,6 +20,7 @@ def _fast_test_settings(settings):
     - Sin validadores de contraseña.
     - Email en memoria.
     - DRF: peticiones de prueba en JSON por defecto.
+    - Caché vacía en cada test (hay vistas cacheadas).
     """
     settings.PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
     settings.AUTH_PASSWORD_VALIDATORS = []
@@ -28,6 +30,8 @@ def _fast_test_settings(settings):
     rf["TEST_REQUEST_DEFAULT_FORMAT"] = "json"
     settings.REST_FRAMEWORK = rf
 
+    cache.clear()
+
 
 # ----------------------------
 # Helpers de cliente
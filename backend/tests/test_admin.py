@@ -0,0 +1,170 @@
+# backend/tests/test_admin.py
+from __future__ import annotations
+
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from cine.models import Pelicula, Sesion, Entrada, TicketStatus
+
+
+@pytest.fixture
+def entradas(db):
+    """Tres entradas reservadas en una misma sesión."""
+    peli = Pelicula.objects.create(titulo="Admin", duracion_min=90, clasificacion="TP")
+    sesion = Sesion.objects.create(
+        pelicula=peli,
+        inicio=timezone.now() + timedelta(hours=2),
+        sala="Sala 1",
+        filas=2,
+        columnas=3,
+    )
+    return [Entrada.objects.create(sesion=sesion, fila="A", numero=n) for n in (1, 2, 3)]
+
+
+# -----------------------
+# Acciones en bloque
+# -----------------------
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    ("action", "estado_inicial", "estado_final"),
+    [
+        ("marcar_como_pagadas", TicketStatus.RESERVADA, TicketStatus.PAGADA),
+        ("marcar_como_reservadas", TicketStatus.PAGADA, TicketStatus.RESERVADA),
+    ],
+)
+def test_marcar_como_un_solo_update(admin_client, entradas, action, estado_inicial, estado_final):
+    Entrada.objects.update(estado=estado_inicial)
+    ids = [e.pk for e in entradas]
+
+    with CaptureQueriesContext(connection) as ctx:
+        r = admin_client.post("/admin/cine/entrada/", {"action": action, "_selected_action": ids})
+    assert r.status_code == 302
+
+    updates = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]
+    assert len(updates) == 1
+    assert set(Entrada.objects.values_list("estado", flat=True)) == {estado_final}
+
+
+# -----------------------
+# Listado de sesiones
+# -----------------------
+@pytest.mark.django_db
+def test_sesion_changelist_contadores(admin_client, entradas):
+    """Los contadores por estado no se multiplican entre sí (sin JOIN N×M)."""
+    Entrada.objects.filter(pk=entradas[0].pk).update(estado=TicketStatus.PAGADA)
+
+    r = admin_client.get("/admin/cine/sesion/")
+    assert r.status_code == 200
+    sesion = r.context["cl"].result_list[0]
+    assert sesion.entradas_count == 3
+    assert sesion.reservadas_count == 2
+    assert sesion.pagadas_count == 1
+
+
+# -----------------------
+# Exportación CSV en segundo plano
+# -----------------------
+@pytest.fixture
+def exports_root(settings, tmp_path):
+    settings.EXPORTS_ROOT = tmp_path
+    return tmp_path
+
+
+@pytest.mark.django_db
+def test_exportar_entradas_sesiones_guarda_csv_y_envia_email(client, admin_client, exports_root, mailoutbox, entradas):
+    from cine.tasks import exportar_entradas_sesiones
+
+    sesion = entradas[0].sesion
+
+    # Llamada directa (síncrona), con o sin Celery instalado
+    nombre = exportar_entradas_sesiones([sesion.pk], "admin@example.com", "http://testserver/")
+    assert (exports_root / nombre).exists()
+
+    assert len(mailoutbox) == 1
+    assert mailoutbox[0].to == ["admin@example.com"]
+    enlace = next(linea for linea in mailoutbox[0].body.splitlines() if linea.startswith("http://testserver/admin/"))
+    ruta = enlace.removeprefix("http://testserver")
+
+    # El enlace no es público: sin sesión de staff redirige al login
+    r = client.get(ruta)
+    assert r.status_code == 302 and "/admin/login/" in r["Location"]
+
+    r = admin_client.get(ruta)
+    assert r.status_code == 200
+    lineas = b"".join(r.streaming_content).decode("utf-8-sig").splitlines()
+    assert lineas[0].startswith("Pelicula,Inicio,Sala,Asiento")
+    assert [linea.split(",")[3] for linea in lineas[1:]] == ["A1", "A2", "A3"]
+
+    # Token manipulado → 404
+    assert admin_client.get(ruta.rstrip("/") + "x/").status_code == 404
+
+
+def test_limpiar_exportaciones_caducadas(exports_root):
+    import os
+    import time
+
+    from cine.exportacion import EXPORTACION_ENLACE_MAX_AGE, limpiar_exportaciones_caducadas
+
+    vieja, nueva = exports_root / "vieja.csv", exports_root / "nueva.csv"
+    vieja.write_text("x")
+    nueva.write_text("x")
+    antes = time.time() - EXPORTACION_ENLACE_MAX_AGE - 60
+    os.utime(vieja, (antes, antes))
+
+    assert limpiar_exportaciones_caducadas() == 1
+    assert not vieja.exists() and nueva.exists()
+
+
+@pytest.mark.django_db
+def test_descargar_exportacion_caducada(admin_client, exports_root, monkeypatch):
+    from django.core.signing import SignatureExpired
+
+    from cine import admin as cine_admin
+
+    def caducado(token):
+        raise SignatureExpired("caducado")
+
+    monkeypatch.setattr(cine_admin, "nombre_exportacion", caducado)
+    assert admin_client.get("/admin/cine/sesion/exportaciones/x:y:z/").status_code == 404
+
+
+@pytest.mark.django_db
+def test_exportar_csv_con_broker_encola(admin_client, settings, monkeypatch, entradas):
+    """Con Celery y broker configurados la acción encola la tarea en lugar de descargar."""
+    llamadas = []
+
+    class TareaFalsa:
+        @staticmethod
+        def delay(*args):
+            llamadas.append(args)
+
+    monkeypatch.setattr("cine.tasks.CELERY_DISPONIBLE", True)
+    monkeypatch.setattr("cine.admin.exportar_entradas_sesiones", TareaFalsa)
+    settings.CELERY_BROKER_URL = "memory://"
+
+    sesion_id = entradas[0].sesion_id
+    r = admin_client.post(
+        "/admin/cine/sesion/",
+        {"action": "exportar_entradas_csv", "_selected_action": [sesion_id]},
+    )
+    assert r.status_code == 302
+    assert llamadas == [([sesion_id], "admin@example.com", "http://testserver/")]
+
+
+@pytest.mark.django_db
+def test_exportar_csv_sin_broker_hace_streaming(admin_client, settings, monkeypatch, entradas):
+    """Celery importable pero sin CELERY_BROKER_URL: no se encola, se descarga al momento."""
+    monkeypatch.setattr("cine.tasks.CELERY_DISPONIBLE", True)
+    settings.CELERY_BROKER_URL = None
+
+    r = admin_client.post(
+        "/admin/cine/sesion/",
+        {"action": "exportar_entradas_csv", "_selected_action": [entradas[0].sesion_id]},
+    )
+    assert r.status_code == 200
+    assert r["Content-Type"].startswith("text/csv")
+    assert len(b"".join(r.streaming_content).decode("utf-8-sig").splitlines()) == 4
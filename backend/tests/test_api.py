@@ -3,6 +3,7 @@ from __future__ import annotations
 
 from datetime import timedelta
 import pytest
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.utils import timezone
 from django.urls import reverse
 
@@ -81,6 +82,21 @@ def test_crear_pelicula_ok(api_auth):
     assert body["id"] and body["titulo"] == "Nueva"
 
 
+@pytest.mark.django_db
+def test_listado_peliculas_cache_se_invalida(api, api_auth, django_assert_num_queries):
+    Pelicula.objects.create(titulo="AAAA", duracion_min=120)
+    url = reverse("peliculas-list")
+    assert [p["titulo"] for p in unwrap_results(api.get(url).json())] == ["AAAA"]
+
+    # Segundo GET servido desde caché: ni COUNT ni SELECT
+    with django_assert_num_queries(0):
+        assert api.get(url).status_code == 200
+
+    # Un alta sube la versión: el siguiente GET ya ve la nueva película
+    api_auth.post(url, {"titulo": "BBBB", "duracion_min": 90}, format="json")
+    assert [p["titulo"] for p in unwrap_results(api.get(url).json())] == ["AAAA", "BBBB"]
+
+
 # -----------------------
 # Sesiones
 # -----------------------
@@ -123,6 +139,59 @@ def test_sesion_asientos_estado(api, api_auth, peli_sesion):
     assert estado_b3 == "pagada"
 
 
+@pytest.mark.django_db
+def test_sesion_asientos_ocupado(api, peli_sesion):
+    _, sesion = peli_sesion
+    Entrada.objects.create(sesion=sesion, fila="C", numero=4)
+
+    r = api.get(reverse("sesiones-asientos", args=[sesion.id]))
+    assert r.status_code == 200
+    layout = r.json()["layout"]
+    # 3 filas (A-C) × 4 columnas; sólo C4 ocupado
+    assert [len(f) for f in layout] == [4, 4, 4]
+    assert [f[0]["fila"] for f in layout] == ["A", "B", "C"]
+    ocupados = [(c["fila"], c["numero"]) for f in layout for c in f if c["ocupado"]]
+    assert ocupados == [("C", 4)]
+
+    # Otra sesión del mismo tamaño reutiliza la plantilla: no debe heredar C4
+    otra = Sesion.objects.create(
+        pelicula=sesion.pelicula, inicio=sesion.inicio + timedelta(hours=3),
+        sala=sesion.sala, filas=sesion.filas, columnas=sesion.columnas,
+    )
+    layout2 = api.get(reverse("sesiones-asientos", args=[otra.id])).json()["layout"]
+    assert not any(c["ocupado"] for f in layout2 for c in f)
+
+
+@pytest.mark.django_db
+def test_sesion_asientos_etag(api, peli_sesion):
+    _, sesion = peli_sesion
+    url = reverse("sesiones-asientos", args=[sesion.id])
+
+    r1 = api.get(url)
+    assert r1.status_code == 200
+    etag = r1["ETag"]
+
+    # Sin cambios → 304 sin cuerpo
+    r2 = api.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert r2.status_code == 304
+
+    # Una entrada nueva y su pago cambian el ETag
+    entrada = Entrada.objects.create(sesion=sesion, fila="A", numero=1)
+    r3 = api.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert r3.status_code == 200
+    assert r3["ETag"] != etag
+
+    Entrada.objects.filter(pk=entrada.pk).update(estado=TicketStatus.PAGADA)
+    r4 = api.get(url, HTTP_IF_NONE_MATCH=r3["ETag"])
+    assert r4.status_code == 200
+
+    # Mover una entrada de asiento (admin) sin cambiar contadores también lo invalida
+    Entrada.objects.filter(pk=entrada.pk).update(fila="B", numero=4)
+    r5 = api.get(url, HTTP_IF_NONE_MATCH=r4["ETag"])
+    assert r5.status_code == 200
+    assert r5["ETag"] != r4["ETag"]
+
+
 @pytest.mark.django_db
 def test_sesion_filters_por_rango(api, peli_sesion):
     _, sesion = peli_sesion
@@ -142,6 +211,62 @@ def test_sesion_filters_por_rango(api, peli_sesion):
     assert any(x["id"] == sesion.id for x in data)
 
 
+@pytest.mark.django_db
+def test_sesion_filter_tiene_reservas(api, peli_sesion):
+    peli, sesion = peli_sesion
+    pagada = Sesion.objects.create(pelicula=peli, inicio=sesion.inicio + timedelta(hours=3), sala="Sala 1")
+    Entrada.objects.create(sesion=sesion, fila="A", numero=1)
+    Entrada.objects.create(sesion=pagada, fila="A", numero=1, estado=TicketStatus.PAGADA)
+
+    url = reverse("sesiones-list")
+    con = [x["id"] for x in unwrap_results(api.get(url, {"tiene_reservas": "true"}).json())]
+    sin = [x["id"] for x in unwrap_results(api.get(url, {"tiene_reservas": "false"}).json())]
+    assert con == [sesion.id]
+    assert sin == [pagada.id]
+
+
+@pytest.mark.django_db
+def test_listar_sesiones_contadores_sin_n_mas_1(api, peli_sesion, django_assert_max_num_queries):
+    peli, sesion = peli_sesion
+    Entrada.objects.create(sesion=sesion, fila="A", numero=1)
+    Entrada.objects.create(sesion=sesion, fila="A", numero=2, estado=TicketStatus.PAGADA)
+    for h in range(3, 6):
+        Sesion.objects.create(pelicula=peli, inicio=sesion.inicio + timedelta(hours=h), sala="Sala 1")
+
+    # COUNT de paginación + SELECT anotado; nada por sesión
+    with django_assert_max_num_queries(2):
+        r = api.get(reverse("sesiones-list"))
+    assert r.status_code == 200
+    s = next(x for x in unwrap_results(r.json()) if x["id"] == sesion.id)
+    assert (s["asientos_totales"], s["asientos_disponibles"]) == (12, 10)
+    assert (s["reservadas"], s["pagadas"]) == (1, 1)
+
+
+@pytest.mark.django_db
+def test_editar_sesion_responde_capacidad_actualizada(api_auth, peli_sesion):
+    _, sesion = peli_sesion
+    Entrada.objects.create(sesion=sesion, fila="A", numero=1)
+
+    # 3×4 → 5×4: la respuesta del PATCH no debe usar valores anotados antes del cambio
+    r = api_auth.patch(reverse("sesiones-detail", args=[sesion.id]), {"filas": 5}, format="json")
+    assert r.status_code == 200
+    assert (r.json()["asientos_totales"], r.json()["asientos_disponibles"]) == (20, 19)
+
+
+@pytest.mark.django_db
+def test_with_counts_sin_count_distinct(peli_sesion):
+    _, sesion = peli_sesion
+    Entrada.objects.create(sesion=sesion, fila="A", numero=1)
+    Entrada.objects.create(sesion=sesion, fila="B", numero=1, estado=TicketStatus.PAGADA)
+
+    # Una sola relación 1:N (select_related de la FK no multiplica filas):
+    # COUNT simple con FILTER, sin DISTINCT.
+    qs = Sesion.objects.select_related("pelicula").with_counts()
+    assert "DISTINCT" not in str(qs.query).upper()
+    s = qs.get(pk=sesion.pk)
+    assert (s.entradas_count, s.reservadas_count, s.pagadas_count) == (2, 1, 1)
+
+
 # -----------------------
 # Entradas
 # -----------------------
@@ -157,6 +282,9 @@ def test_reservar_asiento_conflicto_409(api_auth, peli_sesion):
     assert dup.status_code == 409
     assert "Asiento" in dup.json()["detail"] or "asiento" in dup.json()["detail"]
 
+    # El conflicto no deja la transacción inutilizable: se puede seguir consultando
+    assert Entrada.objects.filter(sesion=sesion).count() == 1
+
 
 @pytest.mark.django_db
 def test_entrada_normaliza_fila(api_auth, peli_sesion):
@@ -188,3 +316,114 @@ def test_pagar_idempotente(api_auth, peli_sesion):
     r2 = api_auth.post(url, {})
     assert r1.status_code == r2.status_code == 200
     assert r1.json()["estado"] == r2.json()["estado"] == "pagada"
+
+
+@pytest.mark.django_db
+def test_pagar_respeta_filtros_de_la_vista(api_auth, peli_sesion):
+    _, sesion = peli_sesion
+    entrada = Entrada.objects.create(sesion=sesion, fila="A", numero=1)
+
+    # Si la vista no devuelve la entrada (filtro que no casa), tampoco la paga
+    url = reverse("entradas-pagar", args=[entrada.id])
+    assert api_auth.post(url + "?estado=pagada", {}).status_code == 404
+    entrada.refresh_from_db()
+    assert entrada.estado == TicketStatus.RESERVADA
+
+    # Id no numérico → 404, sin error de servidor
+    assert api_auth.post(reverse("entradas-pagar", args=["abc"]), {}).status_code == 404
+
+
+@pytest.mark.django_db
+def test_listar_entradas_paginacion_cursor(api, peli_sesion):
+    _, sesion = peli_sesion
+    for numero in range(1, 5):
+        Entrada.objects.create(sesion=sesion, fila="A", numero=numero)
+
+    url = reverse("entradas-list")
+    r = api.get(url)
+    assert r.status_code == 200
+    body = r.json()
+    # Cursor: sin "count", con enlaces next/previous opacos
+    assert "count" not in body
+    assert len(body["results"]) == 4
+    assert body["next"] is None
+
+    # Más recientes primero
+    creadas = [e["creada_en"] for e in body["results"]]
+    assert creadas == sorted(creadas, reverse=True)
+
+
+@pytest.mark.django_db
+def test_paginacion_cursor_ordering_no_soportado_recorre_todo(api, peli_sesion):
+    peli, sesion = peli_sesion
+    grande = Sesion.objects.create(
+        pelicula=peli, inicio=sesion.inicio + timedelta(hours=3), sala="Sala 1", filas=26, columnas=50
+    )
+    total = 1100  # más que el `offset_cutoff` (1000) de CursorPagination
+    Entrada.objects.bulk_create(
+        Entrada(sesion=grande, fila=chr(65 + i // 50), numero=i % 50 + 1) for i in range(total)
+    )
+
+    # ?ordering=estado se ignora: se pagina por creada_en y el recorrido termina
+    ids, url, paginas = [], reverse("entradas-list") + "?ordering=estado", 0
+    while url and paginas < 100:
+        body = api.get(url).json()
+        ids += [e["id"] for e in body["results"]]
+        url, paginas = body["next"], paginas + 1
+    assert url is None
+    assert len(ids) == len(set(ids)) == total
+
+
+@pytest.mark.django_db
+def test_entrada_respeta_dimensiones_tras_editar_sesion(peli_sesion):
+    _, sesion = peli_sesion
+
+    # Sesión de 3 filas (A-C): la D no existe (y las dimensiones quedan cacheadas)
+    Entrada.objects.create(sesion_id=sesion.id, fila="A", numero=1)
+    with pytest.raises(DjangoValidationError):
+        Entrada.objects.create(sesion_id=sesion.id, fila="D", numero=1)
+
+    # Ampliada a 4 filas: la caché de dimensiones no debe quedarse obsoleta
+    sesion.filas = 4
+    sesion.save()
+    Entrada.objects.create(sesion_id=sesion.id, fila="D", numero=1)
+    assert Entrada.objects.filter(sesion=sesion, fila="D").exists()
+
+
+@pytest.mark.django_db
+def test_reservar_varios_asientos_bulk(api, peli_sesion, django_assert_max_num_queries):
+    _, sesion = peli_sesion
+    Entrada.objects.create(sesion=sesion, fila="A", numero=2)
+    url = reverse("entradas-bulk")
+    payload = [{"sesion": sesion.id, "fila": "a", "numero": n, "email": "g@ex.com"} for n in (1, 2, 3)]
+
+    # Savepoint + sesión + INSERT + lectura de vuelta, sin importar cuántos asientos
+    with django_assert_max_num_queries(5):
+        r = api.post(url, payload, format="json")
+    assert r.status_code == 207
+    body = r.json()
+    assert sorted(e["etiqueta_asiento"] for e in body["creadas"]) == ["A1", "A3"]
+    assert [(c["fila"], c["numero"]) for c in body["conflictos"]] == [("A", 2)]
+    assert Entrada.objects.filter(sesion=sesion).count() == 3
+
+    # Todos ocupados → 409
+    r2 = api.post(url, payload[:1], format="json")
+    assert r2.status_code == 409
+
+
+@pytest.mark.django_db
+def test_reservar_bulk_valida_rangos(api, peli_sesion):
+    _, sesion = peli_sesion
+    r = api.post(reverse("entradas-bulk"), [{"sesion": sesion.id, "fila": "Z", "numero": 1}], format="json")
+    assert r.status_code == 400
+    assert not Entrada.objects.exists()
+
+
+@pytest.mark.django_db
+def test_reservar_bulk_rechaza_lista_vacia(api, peli_sesion):
+    _, sesion = peli_sesion
+    Entrada.objects.create(sesion=sesion, fila="A", numero=1)
+
+    # Sin asientos no hay filtro: nunca debe llegar a leer toda la tabla
+    r = api.post(reverse("entradas-bulk"), [], format="json")
+    assert r.status_code == 400
@@ -44,11 +44,7 @@ export interface Sesion {
   pelicula: {
     id: number
     titulo: string
-    descripcion: string
     duracion_min: number
-    clasificacion: string
-    clasificacion_display: string
-    poster_url: string
   }
   inicio: string // ISO
   sala: string